@@ -3,9 +3,22 @@ Coffee Profile Decision Rules (Rule-based + Point Scoring)
 """
 
 from __future__ import annotations
+import functools
 from dataclasses import dataclass
 from typing import Dict, List, Tuple, Optional
 
+import numpy as np
+
+try:
+    from numba import njit, prange
+except ImportError:  # numba opsional: kernel tetap jalan sebagai Python biasa
+    prange = range
+
+    def njit(*args, **kwargs):
+        if len(args) == 1 and callable(args[0]):
+            return args[0]
+        return lambda fn: fn
+
 
 # =================== label candidates ===================
 
@@ -15,62 +28,130 @@ ROAST = ("light", "medium", "dark")
 FLAVOR = ("nutty_chocolate", "sweet_caramel", "fruity", "floral", "spicy")
 PROCESS = ("washed", "natural", "honey", "anaerobic", "any")
 BREW = ("filter", "espresso", "both")
+BEAN = ("arabica", "blend", "robusta")
+
+# scoreboard dimension -> label candidates (urutan = urutan tie-break argmax)
+LABELS: Dict[str, Tuple[str, ...]] = {
+    "acidity": ACIDITY,
+    "caffeine": CAFFEINE,
+    "roast": ROAST,
+    "flavor": FLAVOR,
+    "process": PROCESS,
+    "brew": BREW,
+    # derived/helper:
+    "bean_pref": BEAN,
+}
+
+# scoreboard disimpan sebagai satu vektor flat; posisi tiap dimensi di vektor itu
+DIM_SLICES: Dict[str, slice] = {}
+_offset = 0
+for _dim, _labels in LABELS.items():
+    DIM_SLICES[_dim] = slice(_offset, _offset + len(_labels))
+    _offset += len(_labels)
+TOTAL_LABELS = _offset
+DIM_OFFSETS = np.array([sl.start for sl in DIM_SLICES.values()] + [TOTAL_LABELS], dtype=np.int64)
 
 
 # =================== User input schema ===================
 
-@dataclass
+@dataclass(frozen=True)
 class UserPref:
     stomach_sensitivity: str  # "low"|"medium"|"high"
     caffeine_sensitivity: str  # "low"|"medium"|"high"
     time_of_day: str  # "morning"|"afternoon"|"evening"
     purpose: str  # "focus"|"balanced"|"calm"
-    flavor_direction: List[str]  # pilih 1-2 dari FLAVOR
+    flavor_direction: Tuple[str, ...]  # pilih 1-2 dari FLAVOR (list juga diterima)
     brew_method: str  # "filter"|"espresso"|"both"
 
+    def __post_init__(self) -> None:
+        # simpan sebagai tuple supaya UserPref hashable (dipakai sebagai cache key)
+        object.__setattr__(self, "flavor_direction", tuple(self.flavor_direction))
+
 
 # =================== Scoring utilities ===================
 
-def init_scoreboard() -> Dict[str, Dict[str, int]]:
-    return {
-        "acidity": {k: 0 for k in ACIDITY},
-        "caffeine": {k: 0 for k in CAFFEINE},
-        "roast": {k: 0 for k in ROAST},
-        "flavor": {k: 0 for k in FLAVOR},
-        "process": {k: 0 for k in PROCESS},
-        "brew": {k: 0 for k in BREW},
-        # derived/helper:
-        "bean_pref": {"arabica": 0, "blend": 0, "robusta": 0},
-    }
+_SCOREBOARD_TEMPLATE = np.zeros(TOTAL_LABELS, dtype=np.int16)
+_SCOREBOARD_TEMPLATE.setflags(write=False)
 
 
-def apply_delta(
-    scores: Dict[str, Dict[str, int]],
-    deltas: Dict[str, Dict[str, int]],
-) -> None:
-    
+def init_scoreboard() -> np.ndarray:
+    # satu memcpy dari template statis, bukan bangun ulang scoreboard tiap call
+    return _SCOREBOARD_TEMPLATE.copy()
+
+
+def compile_deltas(deltas: Dict[str, Dict[str, int]]) -> np.ndarray:
+    # encode rule deltas sebagai vektor flat (label/dim yang tidak dikenal diabaikan)
+    vec = init_scoreboard()
     for dim, changes in deltas.items():
-        if dim not in scores:
+        if dim not in LABELS:
             continue
         for label, delta in changes.items():
-            if label in scores[dim]:
-                scores[dim][label] += delta
-
-def argmax_label(score_map: Dict[str, int]) -> str:
-    # pilih label skor tertinggi; kalau seri, pilih yang "lebih aman" via urutan list
-    # (bisa disesuaikan)
-    best = None
-    best_score = None
-    for k, v in score_map.items():
-        if best is None or v > best_score:
-            best, best_score = k, v
-    return best
+            if label in LABELS[dim]:
+                vec[DIM_SLICES[dim].start + LABELS[dim].index(label)] += delta
+    return vec
 
 
-def top_reasons(reasons: List[Tuple[str, int]], k: int = 4) -> List[str]:
-    # reasons format: (text, priority_score)
-    reasons_sorted = sorted(reasons, key=lambda x: x[1], reverse=True)
-    return [r[0] for r in reasons_sorted[:k]]
+@njit(cache=True)
+def _argmax_all(scores_flat, offsets):
+    # argmax per dimensi; kalau seri, pilih yang "lebih aman" via urutan list
+    # (bisa disesuaikan)
+    n_dims = len(offsets) - 1
+    out = np.empty(n_dims, dtype=np.int32)
+    for d in range(n_dims):
+        out[d] = scores_flat[offsets[d]:offsets[d + 1]].argmax()
+    return out
+
+
+@njit(cache=True, parallel=True)
+def _argmax_batch(scores_flat, offsets):
+    # versi batch dari _argmax_all: satu baris per user, diparalelkan per user
+    n_users, n_dims = scores_flat.shape[0], len(offsets) - 1
+    out = np.empty((n_users, n_dims), dtype=np.int32)
+    for u in prange(n_users):
+        for d in range(n_dims):
+            out[u, d] = scores_flat[u, offsets[d]:offsets[d + 1]].argmax()
+    return out
+
+
+@njit(cache=True)
+def _top_rule_ids(rule_ids, rule_weights, k):
+    # top-k rule tanpa full sort; kunci unik (weight, posisi) -> seri ikut urutan di rule_ids
+    n = len(rule_ids)
+    kk = min(k, n)
+    if kk <= 0:
+        return rule_ids[:0]
+    rank_key = np.empty(n, dtype=np.int64)
+    for j in range(n):
+        rank_key[j] = rule_weights[rule_ids[j]] * n + (n - 1 - j)
+    top = np.argpartition(-rank_key, kk - 1)[:kk]
+    top = top[np.argsort(-rank_key[top])]
+    return rule_ids[top]
+
+
+@njit(cache=True)
+def _score_user(scores, rule_ids, rule_matrix, rule_weights, offsets, k):
+    # rule engine untuk satu user: jumlahkan baris rule yang match ke scoreboard (in-place),
+    # argmax per dimensi, lalu top-k rule untuk alasan (seri -> urutan di rule_ids)
+    for i in rule_ids:
+        scores += rule_matrix[i]
+    winners = _argmax_all(scores, offsets)
+    return scores, winners, _top_rule_ids(rule_ids, rule_weights, k)
+
+
+@njit(cache=True, parallel=True)
+def _top_rule_ids_batch(padded_ids, lengths, rule_weights, k):
+    # versi batch dari _top_rule_ids: satu baris rule_ids (di-pad) per user, sisa slot -1
+    n_users = padded_ids.shape[0]
+    out = np.full((n_users, k), -1, dtype=np.int64)
+    for u in prange(n_users):
+        top = _top_rule_ids(padded_ids[u, :lengths[u]], rule_weights, k)
+        out[u, :len(top)] = top
+    return out
+
+
+def scores_to_dict(scores: np.ndarray) -> Dict[str, Dict[str, int]]:
+    # bentuk dict-of-dict untuk output debugging/analysis
+    return {dim: dict(zip(LABELS[dim], scores[sl].tolist())) for dim, sl in DIM_SLICES.items()}
 
 
 # =================== RULES DEFINITION ===================
@@ -233,52 +314,111 @@ FLAVOR_RULES: Dict[str, Rule] = {
 }
 
 
-# =================== Main Function: building coffee profile ===================
+# Precompiled deltas: (field, value) -> flat delta vector
+RULE_DELTAS: Dict[Tuple[str, str], np.ndarray] = {
+    (field_name, value): compile_deltas(deltas)
+    for field_name, field_rules in RULES.items()
+    for value, (deltas, _, _) in field_rules.items()
+}
+RULE_DELTAS.update({
+    ("flavor_direction", f): compile_deltas(deltas)
+    for f, (deltas, _, _) in FLAVOR_RULES.items()
+})
+
+
+# Rule table untuk batch scoring: satu baris per (field, value), kolom = semua label
+RULE_KEYS: List[Tuple[str, str]] = list(RULE_DELTAS)
+RULE_INDEX: Dict[Tuple[str, str], int] = {key: i for i, key in enumerate(RULE_KEYS)}
+RULE_REASONS: List[str] = [
+    (FLAVOR_RULES[value] if field_name == "flavor_direction" else RULES[field_name][value])[1]
+    for field_name, value in RULE_KEYS
+]
+RULE_WEIGHTS = np.array([
+    (FLAVOR_RULES[value] if field_name == "flavor_direction" else RULES[field_name][value])[2]
+    for field_name, value in RULE_KEYS
+], dtype=np.int32)
+
+RULE_MATRIX = np.stack([RULE_DELTAS[key] for key in RULE_KEYS])
+
+# dimensi scoreboard -> key di output profile
+PROFILE_KEYS = {
+    "acidity": "acidity_level",
+    "caffeine": "caffeine_tendency",
+    "roast": "roast_level",
+    "flavor": "flavor_direction",
+    "process": "process_preference",
+    "brew": "brew_suitability",
+    "bean_pref": "bean_preference",
+}
+
+# Override bean_pref (index BEAN, -1 = tidak ada) per (stomach, caffeine) sensitivity.
+# Baris/kolom terakhir untuk nilai di luar SENSITIVITY.
+SENSITIVITY = ("low", "medium", "high")
+BEAN_OVERRIDE = np.full((len(SENSITIVITY) + 1, len(SENSITIVITY) + 1), -1, dtype=np.int8)
+BEAN_OVERRIDE[SENSITIVITY.index("high"), :] = BEAN.index("arabica")
+BEAN_OVERRIDE[:, SENSITIVITY.index("high")] = BEAN.index("arabica")
 
-def build_profile(user: UserPref) -> Dict[str, object]:
-    scores = init_scoreboard()
-    reasons: List[Tuple[str, int]] = []
 
-    # Apply single-choice rules
-    for field_name, value in [
+def sensitivity_index(value: str) -> int:
+    return SENSITIVITY.index(value) if value in SENSITIVITY else len(SENSITIVITY)
+
+
+DISCLAIMER = "This is a preference-based recommendation and not medical advice."
+
+
+# =================== Main Function: building coffee profile ===================
+
+def user_rule_ids(user: UserPref) -> List[int]:
+    # index rule (RULE_KEYS) yang match: field single-choice dulu, lalu flavor sesuai urutan input
+    keys = [
         ("stomach_sensitivity", user.stomach_sensitivity),
         ("caffeine_sensitivity", user.caffeine_sensitivity),
         ("time_of_day", user.time_of_day),
         ("purpose", user.purpose),
         ("brew_method", user.brew_method),
-    ]:
-        field_rules = RULES.get(field_name, {})
-        if value not in field_rules:
-            continue
-        deltas, reason, r_weight = field_rules[value]
-        apply_delta(scores, deltas)
-        reasons.append((reason, r_weight))
+    ] + [("flavor_direction", f) for f in user.flavor_direction]
+    return [RULE_INDEX[key] for key in keys if key in RULE_INDEX]
 
-    # Apply multi-choice flavor rules (1-2)
-    for f in user.flavor_direction:
-        if f not in FLAVOR_RULES:
-            continue
-        deltas, reason, r_weight = FLAVOR_RULES[f]
-        apply_delta(scores, deltas)
-        reasons.append((reason, r_weight))
-
-    # Resolve winners
-    target_acidity = argmax_label(scores["acidity"])
-    target_caffeine = argmax_label(scores["caffeine"])
-    target_roast = argmax_label(scores["roast"])
-    target_flavor = argmax_label(scores["flavor"])
-    target_process = argmax_label(scores["process"])
-    target_brew = argmax_label(scores["brew"])
 
-    # Derived: bean preference from bean_pref scoreboard
-    bean_pref = argmax_label(scores["bean_pref"])  # "arabica"/"blend"/"robusta"
+def score_user(rule_ids: List[int], k: int = 4) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    # (scores flat, index pemenang per dimensi, top-k rule id untuk alasan)
+    rule_ids = np.asarray(rule_ids, dtype=np.int64)
+    return _score_user(init_scoreboard(), rule_ids, RULE_MATRIX, RULE_WEIGHTS, DIM_OFFSETS, k)
 
-    # Optional safety: if process winner is "any" but user selected a flavor that suggests process, keep "any"
-    if user.caffeine_sensitivity == "high" and bean_pref == "robusta":
-        bean_pref = "arabica"
 
-    if user.stomach_sensitivity == "high" and bean_pref == "robusta":
-        bean_pref = "arabica"
+def build_profile(user: UserPref) -> Dict[str, object]:
+    # hasil deterministik per UserPref -> di-cache; caller selalu dapat salinan sendiri
+    result = _build_profile_cached(user)
+    return {
+        "profile": dict(result["profile"]),
+        "scores": {dim: dict(labels) for dim, labels in result["scores"].items()},
+        "reasons": list(result["reasons"]),
+        "disclaimer": result["disclaimer"],
+    }
+
+
+@functools.lru_cache(maxsize=4096)
+def _build_profile_cached(user: UserPref) -> Dict[str, object]:
+    # user -> rule id, lalu scoring + argmax + top alasan dalam satu kernel
+    scores, winner_ids, reason_ids = score_user(user_rule_ids(user), k=4)
+    winners = {dim: LABELS[dim][winner_ids[d]] for d, dim in enumerate(LABELS)}
+    target_acidity = winners["acidity"]
+    target_caffeine = winners["caffeine"]
+    target_roast = winners["roast"]
+    target_flavor = winners["flavor"]
+    target_process = winners["process"]
+    target_brew = winners["brew"]
+
+    # Derived: bean preference from bean_pref scoreboard
+    bean_pref = winners["bean_pref"]  # "arabica"/"blend"/"robusta"
+
+    # Optional safety: high stomach/caffeine sensitivity never ends on robusta
+    override = BEAN_OVERRIDE[
+        sensitivity_index(user.stomach_sensitivity),
+        sensitivity_index(user.caffeine_sensitivity),
+    ]
+    if override >= 0 and bean_pref == "robusta":
+        bean_pref = BEAN[override]
 
     return {
         "profile": {
@@ -290,7 +430,57 @@ def build_profile(user: UserPref) -> Dict[str, object]:
             "brew_suitability": target_brew,
             "bean_preference": bean_pref,
         },
-        "scores": scores,  # for debugging/analysis (bisa disembunyikan di UI)
-        "reasons": top_reasons(reasons, k=4),
-        "disclaimer": "This is a preference-based recommendation and not medical advice.",
+        "scores": scores_to_dict(scores),  # for debugging/analysis (bisa disembunyikan di UI)
+        "reasons": [RULE_REASONS[i] for i in reason_ids],
+        "disclaimer": DISCLAIMER,
     }
+
+
+# =================== Batch: banyak user sekaligus ===================
+
+def top_reason_ids_batch(rule_ids: List[List[int]], k: int = 4) -> np.ndarray:
+    # top-k rule id per user (U, k), urutan seri sama dengan score_user; -1 kalau rule kurang dari k
+    lengths = np.array([len(ids) for ids in rule_ids], dtype=np.int64)
+    padded = np.full((len(rule_ids), max(lengths.max(initial=0), 1)), -1, dtype=np.int64)
+    for u, ids in enumerate(rule_ids):
+        padded[u, :len(ids)] = ids
+    return _top_rule_ids_batch(padded, lengths, RULE_WEIGHTS, max(k, 0))
+
+
+def build_profiles_batch(users: List[UserPref], k: int = 4) -> List[Dict[str, object]]:
+    # Skor semua user dalam satu matmul: (U, R) indicator @ (R, D) rule matrix.
+    # Hasil per user identik dengan build_profile (termasuk urutan alasan yang seri).
+    n_users, n_rules = len(users), len(RULE_KEYS)
+    rule_ids = [user_rule_ids(user) for user in users]
+
+    sel = np.zeros((n_users, n_rules), dtype=np.int32)
+    for u, ids in enumerate(rule_ids):
+        for i in ids:
+            sel[u, i] += 1
+
+    scores_flat = sel @ RULE_MATRIX
+    winner_ids = _argmax_batch(scores_flat, DIM_OFFSETS)
+    winners = {dim: winner_ids[:, d] for d, dim in enumerate(LABELS)}
+
+    # safety: lookup override per (stomach, caffeine), tanpa branch per user
+    stomach_idx = np.array([sensitivity_index(user.stomach_sensitivity) for user in users], dtype=np.intp)
+    caffeine_idx = np.array([sensitivity_index(user.caffeine_sensitivity) for user in users], dtype=np.intp)
+    override = BEAN_OVERRIDE[stomach_idx, caffeine_idx]
+    robusta = winners["bean_pref"] == BEAN.index("robusta")
+    winners["bean_pref"] = np.where((override >= 0) & robusta, override, winners["bean_pref"])
+
+    # konversi ke list Python sekali saja, bukan slice numpy per user per dimensi
+    score_rows = scores_flat.tolist()
+    winner_rows = np.column_stack([winners[dim] for dim in LABELS]).tolist()
+    top_rows = top_reason_ids_batch(rule_ids, k).tolist()
+    dims = [(dim, PROFILE_KEYS[dim], LABELS[dim], DIM_SLICES[dim]) for dim in LABELS]
+
+    results = []
+    for row, winner_row, top_row in zip(score_rows, winner_rows, top_rows):
+        results.append({
+            "profile": {key: labels[w] for (_, key, labels, _), w in zip(dims, winner_row)},
+            "scores": {dim: dict(zip(labels, row[sl])) for dim, _, labels, sl in dims},
+            "reasons": [RULE_REASONS[i] for i in top_row if i >= 0],
+            "disclaimer": DISCLAIMER,
+        })
+    return results
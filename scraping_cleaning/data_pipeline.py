@@ -9,6 +9,9 @@ Usage:
     data_pipeline.py 
     --input     : tokopedia_products.csv 
     --output    : tokopedia_products_cleaned.csv
+    --parquet   : also export tokopedia_products_cleaned.parquet
+    --jobs      : worker processes for text cleaning (default 1)
+    --chunksize : stream the input in chunks of N rows (default: whole file)
 
 """
 
@@ -17,6 +20,7 @@ import numpy as np
 import re
 import argparse  
 import logging
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 from pathlib import Path
 import sys
@@ -33,20 +37,106 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
+# Coffee-related keywords
+COFFEE_KEYWORDS = [
+    'kopi', 'coffee', 'arabica', 'robusta', 'espresso', 'beans', 'biji',
+    'ethiopia', 'gayo', 'toraja', 'aceh', 'sumatra', 'java', 'bali',
+    'colombia', 'brazil', 'kenya', 'flores', 'washed', 'natural', 'honey',
+    'blend', 'single origin', 'roast', 'gram', 'kg', 'filter', 'drip',
+    'anaerobic', 'carbonic', 'maceration', 'wet hulled', 'decaf'
+]
+
+# Non-coffee keywords
+NON_COFFEE_KEYWORDS = [
+    'kaos', 'tshirt', 't-shirt', 'shirt', 'baju', 'apparel', 'jersey',
+    'hoodie', 'jacket', 'denim', 'topi', 'cap', 'hat',
+    'tas', 'bag', 'tote', 'sling', 'backpack',
+    'dompet', 'wallet', 'pouch',
+    'gelas', 'cup', 'mug', 'tumbler', 'glass', 'server', 'dripper',
+    'coaster', 'tatakan',
+    'sticker', 'stiker', 'keychain', 'gantungan',
+    'tools', 'brewing', 'origami', 'filter paper', 'holder',
+    'gift card', 'voucher', 'merchandise'
+]
+
+# Compiled once so each name is scanned in a single regex pass.
+# Names without a non-coffee keyword already count as coffee, so only the
+# non-coffee alternation is needed for classification.
+NON_COFFEE_RE = re.compile('|'.join(map(re.escape, NON_COFFEE_KEYWORDS)), re.IGNORECASE)
+
+# Logical key of a listing, used for duplicate detection
+DEDUP_KEY = ['source', 'name', 'price']
+
+# Text columns are always read as raw text, so a value means the same thing (and
+# hashes/exports the same) no matter what dtype the parser would infer for a file or chunk
+TEXT_COLUMNS = DEDUP_KEY + ['description']
+READ_DTYPES = {col: 'string' for col in TEXT_COLUMNS}
+
+# Vectorized .str calls take the pattern strings (WHITESPACE_RUN, PRICE_STRIP):
+# a compiled pattern makes pandas fall back to one Pattern.sub per row instead of
+# the native pyarrow kernel. The *_RE objects are for the scalar helpers.
+
+# Whitespace run for the vectorized text cleaning: Python's \s plus the
+# Unicode spaces it matches, spelled out because the pyarrow string backend
+# (RE2) treats \s as ASCII-only
+WHITESPACE_RUN = (
+    '[\\s\x0b\x1c-\x1f\x85\xa0\u1680\u2000-\u200a'
+    '\u2028\u2029\u202f\u205f\u3000]+'
+)
+WHITESPACE_RE = re.compile(WHITESPACE_RUN)
+
+# Everything except digits: strips 'Rp', spaces and thousand separators in one pass
+PRICE_STRIP = r'[^0-9]'
+PRICE_STRIP_RE = re.compile(PRICE_STRIP)
+
+
+def clean_price_series(series):
+    # Vectorized equivalent of clean_price: one regex pass over the whole column
+    # Digits only, so prices are non-negative: fixed nullable UInt32 (Rupiah prices
+    # up to ~4.29 billion), same width for every file and chunk
+
+    cleaned = series.astype('string').str.replace(PRICE_STRIP, '', regex=True)
+    prices = pd.to_numeric(cleaned, errors='coerce', dtype_backend='numpy_nullable')
+    # astype would wrap out-of-range amounts silently; count them as failed conversions
+    prices = prices.mask(prices > np.iinfo(np.uint32).max)
+    return prices.astype('UInt32')
+
+
+def classify_names(names):
+    # Vectorized equivalent of is_coffee_product; returns a bool ndarray
+    # Non-coffee keywords win; anything else (incl. no keyword match) counts as coffee
+
+    names = names.astype('string')
+    is_non_coffee = names.str.contains(NON_COFFEE_RE, na=False).to_numpy(dtype=bool)
+    return ~is_non_coffee & names.notna().to_numpy()
+
+
+def clean_text_series(series):
+    # Vectorized equivalent of clean_text over a whole column (module-level so worker processes can pickle it)
+
+    return series.astype('string').str.replace(WHITESPACE_RUN, ' ', regex=True).str.strip()
+
+
 class CoffeeDataPipeline:
     """
     Automated data cleaning pipeline for coffee product data
 
     """
     
-    def __init__(self, input_file: str, output_file: str = None):
+    def __init__(self, input_file: str, output_file: str = None, parquet: bool = False,
+                 n_jobs: int = 1, chunksize: int = None):
         # Initialize pipeline
         
         self.input_file = input_file
         self.output_file = output_file or input_file.replace('.csv', '_cleaned.csv')
+        self.parquet = parquet
+        self.n_jobs = n_jobs
+        self.chunksize = chunksize
         self.df_raw = None
         self.df_clean = None
         self.stats = {}
+        self.seen_keys = None  # DEDUP_KEY hashes of earlier chunks (chunked mode only)
+        self.pool = None  # text-cleaning worker pool, one per run() (n_jobs > 1 only)
         
         logger.info(f"Pipeline initialized")
         logger.info(f"Input: {self.input_file}")
@@ -57,7 +147,13 @@ class CoffeeDataPipeline:
         
         try:
             logger.info("Loading raw data...")
-            self.df_raw = pd.read_csv(self.input_file)
+            try:
+                # pyarrow parses in multithreaded C++ and keeps strings in Arrow buffers
+                self.df_raw = pd.read_csv(self.input_file, engine='pyarrow', dtype_backend='pyarrow',
+                                          dtype=READ_DTYPES)
+            except ImportError:
+                logger.info(" pyarrow not available, falling back to default CSV parser")
+                self.df_raw = pd.read_csv(self.input_file, dtype=READ_DTYPES)
             logger.info(f" Loaded {len(self.df_raw):,} rows, {len(self.df_raw.columns)} columns")
             self.stats['original_rows'] = len(self.df_raw)
             return self
@@ -65,12 +161,63 @@ class CoffeeDataPipeline:
             logger.error(f"Failed to load data: {e}")
             raise
     
+    def process_chunks(self):
+        # Stream the CSV in chunks: clean_fields runs chunk by chunk and only the
+        # columns needed downstream are kept; outliers need global quartiles, so they
+        # are detected afterwards on the concatenated frame
+        
+        logger.info(f"Processing {self.input_file} in chunks of {self.chunksize:,} rows...")
+        self.seen_keys = set()
+        parts = []
+        
+        try:
+            try:
+                # pyarrow engine does not support chunksize; the C parser still yields Arrow-backed columns
+                reader = pd.read_csv(self.input_file, chunksize=self.chunksize, dtype_backend='pyarrow',
+                                     dtype=READ_DTYPES)
+            except ImportError:
+                logger.info(" pyarrow not available, falling back to default CSV parser")
+                reader = pd.read_csv(self.input_file, chunksize=self.chunksize, dtype=READ_DTYPES)
+            for chunk in reader:
+                self.df_raw = chunk
+                self.stats['original_rows'] = self.stats.get('original_rows', 0) + len(chunk)
+                
+                (self
+                 .remove_duplicates()
+                 .clean_fields())
+                
+                parts.append(self.df_raw[[
+                    'source',
+                    'name',
+                    'price',
+                    'description',
+                    'has_missing_critical',
+                    'is_coffee'
+                ]])
+        except Exception as e:
+            logger.error(f"Failed to process chunks: {e}")
+            raise
+        finally:
+            self.seen_keys = None
+        
+        self.df_raw = pd.concat(parts, ignore_index=True)
+        logger.info(f" Processed {self.stats.get('original_rows', 0):,} rows in {len(parts)} chunks")
+        return self
+    
     def remove_duplicates(self):
-        # Remove duplicate rows
+        # Remove duplicate listings (same store, name and price); skips hashing long descriptions
 
         logger.info("Removing duplicates...")
         initial_count = len(self.df_raw)
-        self.df_raw = self.df_raw.drop_duplicates(keep='first')
+        if self.seen_keys is None:
+            self.df_raw = self.df_raw.drop_duplicates(subset=DEDUP_KEY, keep='first')
+        else:
+            # Chunked: also drop keys already seen in earlier chunks (64-bit key hashes)
+            hashes = pd.util.hash_pandas_object(self.df_raw[DEDUP_KEY], index=False).to_numpy()
+            seen = np.fromiter((h in self.seen_keys for h in hashes.tolist()), dtype=bool, count=len(hashes))
+            keep = ~(seen | pd.Series(hashes).duplicated(keep='first').to_numpy())
+            self.seen_keys.update(hashes[keep].tolist())
+            self.df_raw = self.df_raw[keep]
         removed = initial_count - len(self.df_raw)
         
         if removed > 0:
@@ -78,7 +225,7 @@ class CoffeeDataPipeline:
         else:
             logger.info(" No duplicates found")
         
-        self.stats['duplicates_removed'] = removed
+        self.stats['duplicates_removed'] = self.stats.get('duplicates_removed', 0) + removed
         return self
     
     def clean_price(self, price_str):
@@ -87,15 +234,8 @@ class CoffeeDataPipeline:
         if pd.isna(price_str):
             return np.nan
         
-        price_str = str(price_str)
-        price_clean = re.sub(r'[Rp\s.]', '', price_str)
-        price_clean = re.sub(r'[^0-9,]', '', price_clean)
-        price_clean = price_clean.replace(',', '')
-        
-        try:
-            return int(price_clean)
-        except:
-            return np.nan
+        price_clean = PRICE_STRIP_RE.sub('', str(price_str))
+        return int(price_clean) if price_clean else np.nan
     
     def clean_text(self, text):
     
@@ -103,11 +243,7 @@ class CoffeeDataPipeline:
         if pd.isna(text):
             return text
         
-        text = str(text)
-        text = re.sub(r'\s+', ' ', text)
-        text = text.strip()
-        
-        return text
+        return WHITESPACE_RE.sub(' ', str(text)).strip()
     
     def is_coffee_product(self, product_name):
         """
@@ -120,86 +256,68 @@ class CoffeeDataPipeline:
         if pd.isna(product_name):
             return False
         
-        name_lower = str(product_name).lower()
-        
-        # Coffee-related keywords
-        coffee_keywords = [
-            'kopi', 'coffee', 'arabica', 'robusta', 'espresso', 'beans', 'biji',
-            'ethiopia', 'gayo', 'toraja', 'aceh', 'sumatra', 'java', 'bali',
-            'colombia', 'brazil', 'kenya', 'flores', 'washed', 'natural', 'honey',
-            'blend', 'single origin', 'roast', 'gram', 'kg', 'filter', 'drip',
-            'anaerobic', 'carbonic', 'maceration', 'wet hulled', 'decaf'
-        ]
-        
-        # Non-coffee keywords
-        non_coffee_keywords = [
-            'kaos', 'tshirt', 't-shirt', 'shirt', 'baju', 'apparel', 'jersey',
-            'hoodie', 'jacket', 'denim', 'topi', 'cap', 'hat',
-            'tas', 'bag', 'tote', 'sling', 'backpack',
-            'dompet', 'wallet', 'pouch',
-            'gelas', 'cup', 'mug', 'tumbler', 'glass', 'server', 'dripper',
-            'coaster', 'tatakan',
-            'sticker', 'stiker', 'keychain', 'gantungan',
-            'tools', 'brewing', 'origami', 'filter paper', 'holder',
-            'gift card', 'voucher', 'merchandise'
-        ]
-        
-        # Check non-coffee keywords first
-        for keyword in non_coffee_keywords:
-            if keyword in name_lower:
-                return False
-        
-        # Check coffee keywords
-        for keyword in coffee_keywords:
-            if keyword in name_lower:
-                return True
-        
-        return True
+        return NON_COFFEE_RE.search(str(product_name)) is None
     
-    def standardize_price(self):
+    def clean_text_columns(self, df):
+        # Clean source/name/description; returns {col: cleaned series}
 
-        # Standardize price format
-        logger.info("Standardizing price format...")
-        
-        self.df_raw['price_clean'] = self.df_raw['price'].apply(self.clean_price)
+        text_columns = [col for col in ['source', 'name', 'description'] if col in df.columns]
         
-        failed = self.df_raw[self.df_raw['price_clean'].isna() & self.df_raw['price'].notna()]
-        if len(failed) > 0:
-            logger.warning(f"{len(failed)} prices failed to convert")
+        # Columns are independent: with a worker pool each one is cleaned in its own process
+        if self.pool is not None and len(text_columns) > 1:
+            cleaned = list(self.pool.map(clean_text_series, [df[col] for col in text_columns]))
         else:
-            logger.info("All prices converted successfully")
+            cleaned = [clean_text_series(df[col]) for col in text_columns]
         
-        self.stats['price_conversion_failures'] = len(failed)
-        return self
+        return dict(zip(text_columns, cleaned))
     
-    def clean_text_fields(self):
+    def _clean_batch(self, df):
+        # Compute every per-row derived column from the raw columns, then write them back
+        # under the canonical names in one assign, so raw and clean copies never coexist
 
-        # Clean all text fields
-        logger.info("Cleaning text fields...")
-        
-        text_columns = ['source', 'name', 'description']
-        for col in text_columns:
-            if col in self.df_raw.columns:
-                self.df_raw[f'{col}_clean'] = self.df_raw[col].apply(self.clean_text)
-        
-        logger.info(" Text fields cleaned")
-        return self
+        price_clean = clean_price_series(df['price'])
+        text_clean = self.clean_text_columns(df)
+        is_coffee = classify_names(df['name'])
+        has_missing_critical = text_clean['name'].isna().to_numpy() | price_clean.isna().to_numpy()
+        
+        return df.assign(
+            price=price_clean,
+            **text_clean,
+            is_coffee=is_coffee,
+            has_missing_critical=has_missing_critical,
+        )
     
-    def classify_products(self):
+    def clean_fields(self):
 
-        # Classify products as coffee or non-coffee
-        logger.info("Classifying products (Coffee vs Non-Coffee)...")
+        # Standardize price, clean text fields, classify products and flag missing
+        # critical fields in one fused pass
+        logger.info("Cleaning fields (price, text, coffee classification, missing critical)...")
         
-        self.df_raw['is_coffee'] = self.df_raw['name'].apply(self.is_coffee_product)
+        had_price = self.df_raw['price'].notna().to_numpy()
+        self.df_raw = self._clean_batch(self.df_raw)
+        
+        failed = (self.df_raw['price'].isna().to_numpy() & had_price).sum()
+        if failed > 0:
+            logger.warning(f"{failed} prices failed to convert")
+        else:
+            logger.info(" All prices converted successfully")
         
         coffee_count = self.df_raw['is_coffee'].sum()
         non_coffee_count = (~self.df_raw['is_coffee']).sum()
+        total = max(len(self.df_raw), 1)  # a chunk can be empty after cross-chunk dedup
+        logger.info(f" Coffee products: {coffee_count} ({coffee_count/total*100:.2f}%)")
+        logger.info(f" Non-coffee products: {non_coffee_count} ({non_coffee_count/total*100:.2f}%)")
         
-        logger.info(f" Coffee products: {coffee_count} ({coffee_count/len(self.df_raw)*100:.2f}%)")
-        logger.info(f" Non-coffee products: {non_coffee_count} ({non_coffee_count/len(self.df_raw)*100:.2f}%)")
+        missing = self.df_raw['has_missing_critical'].sum()
+        if missing > 0:
+            logger.warning(f"{missing} rows with missing critical fields")
+        else:
+            logger.info(" No missing critical fields")
         
-        self.stats['coffee_products'] = coffee_count
-        self.stats['non_coffee_products'] = non_coffee_count
+        self.stats['price_conversion_failures'] = self.stats.get('price_conversion_failures', 0) + failed
+        self.stats['coffee_products'] = self.stats.get('coffee_products', 0) + coffee_count
+        self.stats['non_coffee_products'] = self.stats.get('non_coffee_products', 0) + non_coffee_count
+        self.stats['missing_critical'] = self.stats.get('missing_critical', 0) + missing
         return self
     
     def detect_outliers(self):
@@ -207,57 +325,40 @@ class CoffeeDataPipeline:
         # Detect price outliers using IQR method
         logger.info("Detecting price outliers...")
         
-        Q1 = self.df_raw['price_clean'].quantile(0.25)
-        Q3 = self.df_raw['price_clean'].quantile(0.75)
+        # One partition pass for all three percentiles on the raw ndarray
+        prices = self.df_raw['price'].to_numpy(dtype=np.float64, na_value=np.nan)
+        Q1, median, Q3 = np.nanpercentile(prices, [25, 50, 75])
         IQR = Q3 - Q1
         
         lower_bound = Q1 - 1.5 * IQR
         upper_bound = Q3 + 1.5 * IQR
         
-        self.df_raw['is_price_outlier'] = (
-            (self.df_raw['price_clean'] < lower_bound) | 
-            (self.df_raw['price_clean'] > upper_bound)
-        )
+        self.df_raw['is_price_outlier'] = (prices < lower_bound) | (prices > upper_bound)
         
         outliers = self.df_raw['is_price_outlier'].sum()
         logger.info(f" Detected {outliers} price outliers ({outliers/len(self.df_raw)*100:.2f}%)")
         
         self.stats['price_outliers'] = outliers
         self.stats['price_q1'] = Q1
-        self.stats['price_median'] = self.df_raw['price_clean'].median()
+        self.stats['price_median'] = median
         self.stats['price_q3'] = Q3
         return self
     
-    def flag_missing_critical(self):
-
-        # Flag rows with missing critical fields
-        logger.info("Flagging missing critical fields...")
-        
-        self.df_raw['has_missing_critical'] = (
-            self.df_raw['name_clean'].isna() | 
-            self.df_raw['price_clean'].isna()
-        )
-        
-        missing = self.df_raw['has_missing_critical'].sum()
-        if missing > 0:
-            logger.warning(f"{missing} rows with missing critical fields")
-        else:
-            logger.info(" No missing critical fields")
-        
-        self.stats['missing_critical'] = missing
-        return self
-    
     def validate_data_types(self):
 
         # Validate and set proper data types
         logger.info("Validating data types...")
         
-        self.df_raw['price_clean'] = pd.to_numeric(self.df_raw['price_clean'], errors='coerce')
+        self.df_raw['price'] = pd.to_numeric(self.df_raw['price'], errors='coerce')
         
-        for col in ['source_clean', 'name_clean', 'description_clean']:
+        for col in ['name', 'description']:
             if col in self.df_raw.columns:
                 self.df_raw[col] = self.df_raw[col].astype('string')
         
+        # source is low-cardinality (one value per store), so keep it as integer codes
+        if 'source' in self.df_raw.columns:
+            self.df_raw['source'] = self.df_raw['source'].astype('string').astype('category')
+        
         logger.info(" Data types validated")
         return self
     
@@ -266,17 +367,8 @@ class CoffeeDataPipeline:
         # Create final cleaned dataset
         logger.info("Creating final dataset...")
         
+        # Columns already carry their canonical names (cleaned in place by clean_fields)
         self.df_clean = self.df_raw[[
-            'source_clean',
-            'name_clean',
-            'price_clean',
-            'description_clean',
-            'has_missing_critical',
-            'is_price_outlier',
-            'is_coffee'
-        ]].copy()
-        
-        self.df_clean.columns = [
             'source',
             'name',
             'price',
@@ -284,7 +376,7 @@ class CoffeeDataPipeline:
             'has_missing_critical',
             'is_price_outlier',
             'is_coffee'
-        ]
+        ]].copy()
         
         logger.info(f" Final dataset created: {self.df_clean.shape}")
         self.stats['final_rows'] = len(self.df_clean)
@@ -314,6 +406,21 @@ class CoffeeDataPipeline:
         
         return self
     
+    def export_parquet(self):
+
+        # Export cleaned data to Parquet (keeps dtypes, e.g. categorical source)
+        parquet_file = self.output_file.replace('.csv', '.parquet')
+        logger.info(f"Exporting cleaned data to {parquet_file}...")
+        
+        try:
+            self.df_clean.to_parquet(parquet_file, index=False, compression='zstd')
+            logger.info(f" Parquet exported successfully")
+        except Exception as e:
+            logger.error(f"Failed to export parquet: {e}")
+            raise
+        
+        return self
+    
     def generate_report(self):
 
         # Generate summary report for Data Analytics and Data Science Teams
@@ -335,26 +442,44 @@ class CoffeeDataPipeline:
 
         # Run complete pipeline
         logger.info("Starting data cleaning pipeline...")
+        self.stats = {}  # counters accumulate per chunk, so start every run from zero
+        
+        # Start the worker pool once and reuse it for every chunk (one task per text column)
+        if self.n_jobs > 1:
+            self.pool = ProcessPoolExecutor(max_workers=min(self.n_jobs, 3))
         
         try:
+            if self.chunksize:
+                (self
+                 .process_chunks()
+                 .detect_outliers())
+            else:
+                (self
+                 .load_data()
+                 .remove_duplicates()
+                 .clean_fields()
+                 .detect_outliers())
+            
             (self
-             .load_data()
-             .remove_duplicates()
-             .standardize_price()
-             .clean_text_fields()
-             .classify_products()
-             .detect_outliers()
-             .flag_missing_critical()
              .validate_data_types()
              .create_final_dataset()
-             .export_data()
-             .generate_report())
+             .export_data())
+            
+            if self.parquet:
+                self.export_parquet()
+            
+            self.generate_report()
             
             return True
         
         except Exception as e:
             logger.error(f"Pipeline failed: {e}")
             return False
+        
+        finally:
+            if self.pool is not None:
+                self.pool.shutdown()
+                self.pool = None
 
 
 def main():
@@ -367,11 +492,18 @@ def main():
     parser.add_argument('--output', '-o',
                        default='tokopedia_products_cleaned.csv',
                        help='Output CSV file path')
+    parser.add_argument('--parquet', action='store_true',
+                       help='Also export cleaned data as Parquet')
+    parser.add_argument('--jobs', '-j', type=int, default=1,
+                       help='Worker processes for text cleaning (default: 1)')
+    parser.add_argument('--chunksize', type=int, default=None,
+                       help='Stream the input CSV in chunks of this many rows')
     
     args = parser.parse_args()
     
     # Run pipeline
-    pipeline = CoffeeDataPipeline(args.input, args.output)
+    pipeline = CoffeeDataPipeline(args.input, args.output, parquet=args.parquet,
+                                  n_jobs=args.jobs, chunksize=args.chunksize)
     success = pipeline.run()
     
     sys.exit(0 if success else 1)
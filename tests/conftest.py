@@ -0,0 +1,8 @@
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# decision_rules.py lives at the repo root, data_pipeline.py in scraping_cleaning/
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "scraping_cleaning"))
@@ -0,0 +1,65 @@
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+from data_pipeline import CoffeeDataPipeline
+
+SCRAPE = Path(__file__).resolve().parent.parent / "scraping_cleaning" / "tokopedia_products.csv"
+
+
+def run_pipeline(input_file, output_file, **kwargs):
+    pipeline = CoffeeDataPipeline(str(input_file), str(output_file), **kwargs)
+    assert pipeline.run()
+    return pipeline
+
+
+def test_chunked_dedup_matches_single_pass_with_mixed_price_dtypes(tmp_path):
+    # chunk 1 and 3 would infer price as int, chunk 2 as string;
+    # numeric-looking descriptions would be inferred as float per chunk
+    input_file = tmp_path / "products.csv"
+    input_file.write_text(
+        "source,name,price,description\n"
+        "B,Kopi c,195000,1.50\n"
+        "A,Kopi b,Rp2.000,007\n"
+        "B,Kopi c,195000,hello\n"
+        "B,Kopi d,1000,\n"
+    )
+
+    single = run_pipeline(input_file, tmp_path / "single.csv")
+    assert single.stats["duplicates_removed"] == 1
+    assert single.df_clean["description"].tolist()[:2] == ["1.50", "007"]
+
+    for chunksize in (1, 2, 3):
+        chunked = run_pipeline(input_file, tmp_path / f"chunked_{chunksize}.csv", chunksize=chunksize)
+        assert chunked.stats["duplicates_removed"] == 1
+        pd.testing.assert_frame_equal(
+            chunked.df_clean.reset_index(drop=True),
+            single.df_clean.reset_index(drop=True),
+        )
+
+
+@pytest.mark.parametrize("chunksize", [100, 367, 5000])
+def test_chunked_output_matches_single_pass(tmp_path, chunksize):
+    single = run_pipeline(SCRAPE, tmp_path / "single.csv")
+    chunked = run_pipeline(SCRAPE, tmp_path / "chunked.csv", chunksize=chunksize)
+
+    assert (tmp_path / "chunked.csv").read_bytes() == (tmp_path / "single.csv").read_bytes()
+    for key in ("original_rows", "duplicates_removed", "final_rows", "price_outliers"):
+        assert chunked.stats[key] == single.stats[key]
+
+
+@pytest.mark.parametrize("chunksize", [None, 367])
+def test_rerun_does_not_accumulate_stats(tmp_path, chunksize):
+    pipeline = run_pipeline(SCRAPE, tmp_path / "out.csv", chunksize=chunksize)
+    first = dict(pipeline.stats)
+    assert pipeline.run()
+    assert pipeline.stats == first
+
+
+def test_parallel_text_cleaning_matches_sequential(tmp_path):
+    single = run_pipeline(SCRAPE, tmp_path / "single.csv")
+    parallel = run_pipeline(SCRAPE, tmp_path / "parallel.csv", n_jobs=2, chunksize=300)
+
+    assert parallel.pool is None  # shut down at the end of run()
+    assert (tmp_path / "parallel.csv").read_bytes() == (tmp_path / "single.csv").read_bytes()
@@ -0,0 +1,41 @@
+import itertools
+
+import pytest
+
+from decision_rules import (
+    FLAVOR,
+    RULE_REASONS,
+    UserPref,
+    build_profile,
+    build_profiles_batch,
+    score_user,
+    user_rule_ids,
+)
+
+LEVELS = ("low", "medium", "high")
+TIMES = ("morning", "afternoon", "evening")
+PURPOSES = ("focus", "balanced", "calm")
+BREWS = ("filter", "espresso", "both")
+# urutan dibalik dan flavor dobel memicu skor alasan yang seri
+FLAVOR_INPUTS = [(), ("nutty_chocolate",), ("fruity", "floral"), ("floral", "fruity"), ("spicy", "spicy"), FLAVOR]
+
+
+def all_users():
+    return [
+        UserPref(stomach, caffeine, time, purpose, flavors, brew)
+        for stomach, caffeine, time, purpose, brew in itertools.product(LEVELS, LEVELS, TIMES, PURPOSES, BREWS)
+        for flavors in FLAVOR_INPUTS
+    ]
+
+
+def test_batch_matches_build_profile():
+    users = all_users()
+    assert build_profiles_batch(users) == [build_profile(user) for user in users]
+
+
+@pytest.mark.parametrize("k", [0, 1, 10])
+def test_batch_reasons_match_score_user_for_any_k(k):
+    users = all_users()[:60]
+    for user, result in zip(users, build_profiles_batch(users, k=k)):
+        _, _, reason_ids = score_user(user_rule_ids(user), k=k)
+        assert result["reasons"] == [RULE_REASONS[i] for i in reason_ids]